@@ -0,0 +1,233 @@
+"""Memory-mapped columnar copy of the attendance history"""
+import os
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ATTENDANCE_COLUMNS = ['StudentID', 'Name', 'Date', 'Time', 'Method', 'Status']
+
+# Superseded snapshots stay on disk this long so readers still mapping them
+# (or background jobs pinned to them) can finish
+SNAPSHOT_RETENTION_SECONDS = 600
+
+# Bumped whenever the on-disk snapshot layout changes
+SNAPSHOT_FORMAT = 2
+
+def normalize(df):
+    """Attendance columns as strings, with missing values stored as ''"""
+    return pd.DataFrame({
+        col: df[col].fillna("").astype(str) if col in df.columns else ""
+        for col in ATTENDANCE_COLUMNS
+    }, index=df.index)
+
+def fingerprint(df):
+    """Order-independent hash of the attendance rows' content"""
+    if df.empty:
+        return 0
+    return int(pd.util.hash_pandas_object(normalize(df), index=False).sum())
+
+class AttendanceHistory:
+    """Read-only columnar copy of the attendance history, memory-mapped from disk.
+
+    Every column is stored as an int32 code array (``<column>.npy``) plus a
+    sorted fixed-width string dictionary (``<column>.dict.npy``). Both are
+    opened with ``mmap_mode='r'`` so filters run over the OS page cache, which
+    is shared by every process reading the same snapshot.
+
+    Each snapshot is written into its own uniquely named directory and then
+    published by atomically replacing ``current.json``, so concurrent writers
+    never share files. ``generation`` is the name of the mapped directory.
+    Rows are stored sorted by Date, so a date range is a contiguous row slice.
+    """
+
+    def __init__(self, history_dir):
+        self.history_dir = history_dir
+        self.manifest_file = os.path.join(history_dir, "current.json")
+        self.generation = None
+        self.fingerprint = None
+        self.rows = 0
+        self.codes = {}
+        self.dictionaries = {}
+        self._manifest_mtime = None
+
+    def _read_manifest(self):
+        """Read the manifest pointing at the current snapshot"""
+        try:
+            with open(self.manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Manifests from older snapshot layouts are treated as missing
+        if not isinstance(manifest.get('generation'), str) or manifest.get('format') != SNAPSHOT_FORMAT:
+            return None
+        return manifest
+
+    def _snapshot_dir(self, generation):
+        return os.path.join(self.history_dir, generation)
+
+    def write_snapshot(self, df):
+        """Write a new snapshot of the attendance data and publish it"""
+        os.makedirs(self.history_dir, exist_ok=True)
+        snapshot_dir = tempfile.mkdtemp(prefix="v", dir=self.history_dir)
+        generation = os.path.basename(snapshot_dir)
+
+        df = normalize(df)
+        # A stable sort keeps the original order within each day
+        df = df.iloc[np.argsort(df['Date'].to_numpy(), kind='stable')]
+        for col in ATTENDANCE_COLUMNS:
+            values = df[col].to_numpy(dtype=object)
+            # np.unique returns a sorted dictionary, so code order matches
+            # string order and date ranges become code ranges
+            dictionary, codes = np.unique(values, return_inverse=True)
+            np.save(os.path.join(snapshot_dir, f"{col}.npy"), codes.astype(np.int32))
+            np.save(os.path.join(snapshot_dir, f"{col}.dict.npy"), dictionary.astype(str))
+
+        # Swap the manifest atomically so readers never see a half-written snapshot
+        fd, manifest_tmp = tempfile.mkstemp(suffix=".tmp", dir=self.history_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'generation': generation, 'rows': len(df), 'format': SNAPSHOT_FORMAT,
+                       'fingerprint': fingerprint(df)}, f)
+        previous = self._read_manifest()
+        os.replace(manifest_tmp, self.manifest_file)
+
+        if previous:
+            # Start the retention clock from when the old snapshot was superseded
+            try:
+                os.utime(self._snapshot_dir(previous['generation']))
+            except OSError:
+                pass
+        self._remove_old_snapshots(generation)
+
+    def _remove_old_snapshots(self, current):
+        """Delete superseded or abandoned snapshots past the retention period"""
+        cutoff = time.time() - SNAPSHOT_RETENTION_SECONDS
+        for name in os.listdir(self.history_dir):
+            path = os.path.join(self.history_dir, name)
+            if name == current or not os.path.isdir(path):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def refresh(self):
+        """Map the current snapshot, re-mapping only when a newer one exists.
+
+        Returns whether a snapshot is mapped; if the newer one cannot be read
+        the previous mapping is kept.
+        """
+        try:
+            manifest_mtime = os.stat(self.manifest_file).st_mtime_ns
+        except OSError:
+            return self.generation is not None
+        if self.generation is not None and manifest_mtime == self._manifest_mtime:
+            return True
+
+        manifest = self._read_manifest()
+        if manifest is None:
+            return self.generation is not None
+        if manifest['generation'] != self.generation and not self.map_snapshot(manifest['generation']):
+            return self.generation is not None
+        self.fingerprint = manifest.get('fingerprint')
+        self._manifest_mtime = manifest_mtime
+        return True
+
+    def map_snapshot(self, generation):
+        """Map one specific snapshot; False if it no longer exists"""
+        try:
+            snapshot_dir = self._snapshot_dir(generation)
+            codes = {}
+            dictionaries = {}
+            for col in ATTENDANCE_COLUMNS:
+                codes[col] = np.load(os.path.join(snapshot_dir, f"{col}.npy"), mmap_mode='r')
+                dictionaries[col] = np.load(os.path.join(snapshot_dir, f"{col}.dict.npy"), mmap_mode='r')
+        except (OSError, ValueError):
+            # The snapshot was removed while we were opening it
+            return False
+
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.rows = len(codes['Date'])
+        self.generation = generation
+        return True
+
+    def __len__(self):
+        return self.rows
+
+    def _take(self, mask):
+        """Materialize only the selected rows as a DataFrame"""
+        return pd.DataFrame({
+            col: self.dictionaries[col][np.asarray(self.codes[col][mask])]
+            for col in ATTENDANCE_COLUMNS
+        })
+
+    def to_frame(self):
+        """Materialize the whole history as a DataFrame"""
+        return self._take(slice(None))
+
+    def row_range(self, start_date, end_date):
+        """(start, stop) row slice holding start_date <= Date <= end_date"""
+        dates = self.dictionaries['Date']
+        low = np.searchsorted(dates, str(start_date), side='left')
+        high = np.searchsorted(dates, str(end_date), side='right')
+        # Rows are sorted by Date, so the matching codes are contiguous
+        date_codes = self.codes['Date']
+        return (int(np.searchsorted(date_codes, low, side='left')),
+                int(np.searchsorted(date_codes, high, side='left')))
+
+    def take_rows(self, start, stop):
+        """Materialize a contiguous slice of rows"""
+        return self._take(slice(start, stop))
+
+    def filter_date_range(self, start_date, end_date):
+        """Rows with start_date <= Date <= end_date"""
+        return self.take_rows(*self.row_range(start_date, end_date))
+
+    def dates(self, start_date=None, end_date=None):
+        """Sorted distinct dates, optionally limited to a date range"""
+        dates = self.dictionaries.get('Date', np.array([], dtype=str))
+        low = np.searchsorted(dates, str(start_date), side='left') if start_date else 0
+        high = np.searchsorted(dates, str(end_date), side='right') if end_date else len(dates)
+        return dates[low:high].tolist()
+
+    def filter_student(self, student_id):
+        """Rows for a single student"""
+        student_ids = self.dictionaries['StudentID']
+        code = np.searchsorted(student_ids, str(student_id))
+        if code >= len(student_ids) or student_ids[code] != str(student_id):
+            return self._take(np.zeros(self.rows, dtype=bool))
+        return self._take(self.codes['StudentID'] == code)
+
+    def _counts(self, col):
+        """Rows per dictionary value, leaving out missing values ('')"""
+        dictionary = self.dictionaries[col]
+        counts = np.bincount(self.codes[col], minlength=len(dictionary))
+        counts = pd.Series(counts, index=pd.Index(dictionary, name=col))
+        # The dictionary is sorted, so '' can only be the first entry; drop it
+        # to match pandas, which skips NaN in these aggregates
+        if len(dictionary) and dictionary[0] == "":
+            counts = counts.iloc[1:]
+        return counts
+
+    def value_counts(self, col):
+        """Equivalent of DataFrame[col].value_counts()"""
+        counts = self._counts(col)
+        return counts[counts > 0].sort_values(ascending=False).rename('count')
+
+    def distinct(self, col):
+        """Distinct non-missing values of a column, in sorted order"""
+        return self._counts(col).index.tolist()
+
+    def nunique(self, col):
+        """Equivalent of DataFrame[col].nunique()"""
+        return int(np.count_nonzero(self._counts(col)))
+
+    def daily_counts(self):
+        """Equivalent of DataFrame.groupby('Date').size()"""
+        counts = self._counts('Date')
+        return counts[counts > 0]
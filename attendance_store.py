@@ -0,0 +1,228 @@
+"""Shared SQLite store for running several app replicas against one database"""
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from attendance_history import ATTENDANCE_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance (
+    StudentID TEXT NOT NULL,
+    Name TEXT,
+    Date TEXT NOT NULL,
+    Time TEXT,
+    Method TEXT,
+    Status TEXT,
+    UNIQUE (StudentID, Date)
+);
+CREATE INDEX IF NOT EXISTS attendance_date ON attendance (Date);
+
+CREATE TABLE IF NOT EXISTS students (
+    student_id TEXT PRIMARY KEY,
+    name TEXT,
+    department TEXT,
+    added_date TEXT
+);
+
+-- Change feed: every write is recorded by the triggers below, so replicas
+-- can apply other replicas' writes without reloading everything
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    StudentID TEXT,
+    Name TEXT,
+    Date TEXT,
+    Time TEXT,
+    Method TEXT,
+    Status TEXT
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+
+CREATE TRIGGER IF NOT EXISTS attendance_insert AFTER INSERT ON attendance BEGIN
+    INSERT INTO changes (op, StudentID, Name, Date, Time, Method, Status)
+    VALUES ('insert', NEW.StudentID, NEW.Name, NEW.Date, NEW.Time, NEW.Method, NEW.Status);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_delete AFTER DELETE ON attendance BEGIN
+    INSERT INTO changes (op, StudentID, Date) VALUES ('delete', OLD.StudentID, OLD.Date);
+END;
+CREATE TRIGGER IF NOT EXISTS student_insert AFTER INSERT ON students BEGIN
+    INSERT INTO changes (op, StudentID) VALUES ('student', NEW.student_id);
+END;
+CREATE TRIGGER IF NOT EXISTS student_update AFTER UPDATE ON students BEGIN
+    INSERT INTO changes (op, StudentID) VALUES ('student', NEW.student_id);
+END;
+CREATE TRIGGER IF NOT EXISTS student_delete AFTER DELETE ON students BEGIN
+    INSERT INTO changes (op, StudentID) VALUES ('student', OLD.student_id);
+END;
+"""
+
+class SQLiteAttendanceStore:
+    """Attendance and student registry in a SQLite database in WAL mode.
+
+    The database enforces (StudentID, Date) uniqueness, so two replicas can
+    never both mark the same student on the same day. Writes are recorded in
+    the ``changes`` table, read with ``changes_since``.
+    """
+
+    def __init__(self, db_file, timeout=30):
+        self.db_file = db_file
+        self.timeout = timeout
+        with closing(self._connect()) as conn:
+            # WAL is persistent, so it only needs setting once per database
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def is_imported(self):
+        """Check whether the one-time import of local files has happened"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone()
+        return row is not None
+
+    def import_data(self, attendance_df, students_data):
+        """Import existing CSV/JSON data once, skipping duplicate marks"""
+        rows = attendance_df.reindex(columns=ATTENDANCE_COLUMNS).fillna("").astype(str)
+        with closing(self._connect()) as conn, conn:
+            # Take the write lock first so only one replica can run the import
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                return
+            conn.execute("INSERT INTO meta (key, value) VALUES ('imported', 1)")
+            # A database that already holds data was set up before the flag
+            # existed; only record the flag for it
+            has_data = (conn.execute("SELECT 1 FROM attendance LIMIT 1").fetchone()
+                        or conn.execute("SELECT 1 FROM students LIMIT 1").fetchone())
+            if has_data:
+                return
+            conn.executemany(
+                "INSERT OR IGNORE INTO attendance VALUES (?, ?, ?, ?, ?, ?)",
+                rows.itertuples(index=False, name=None)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO students VALUES (?, ?, ?, ?)",
+                [(sid, info.get('name'), info.get('department'), info.get('added_date'))
+                 for sid, info in students_data.items()]
+            )
+
+    def load(self):
+        """Read (latest change seq, attendance DataFrame, students dict) consistently"""
+        with closing(self._connect()) as conn:
+            # One read transaction so the data matches the returned seq
+            conn.execute("BEGIN")
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            seq = max(seq, self._pruned_through(conn))
+            attendance_df = pd.read_sql_query(
+                "SELECT StudentID, Name, Date, Time, Method, Status FROM attendance ORDER BY rowid",
+                conn
+            )
+            students = conn.execute(
+                "SELECT student_id, name, department, added_date FROM students"
+            ).fetchall()
+            conn.rollback()
+        students_data = {
+            sid: {'name': name, 'department': department, 'added_date': added_date}
+            for sid, name, department, added_date in students
+        }
+        return seq, attendance_df, students_data
+
+    def _pruned_through(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'pruned_through'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq):
+        """Get changes after seq as DataFrame, or None if they were pruned"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            if seq < self._pruned_through(conn):
+                conn.rollback()
+                return None
+            changes = pd.read_sql_query(
+                "SELECT seq, op, StudentID, Name, Date, Time, Method, Status "
+                "FROM changes WHERE seq > ? ORDER BY seq",
+                conn, params=(seq,)
+            )
+            conn.rollback()
+        return changes
+
+    def prune_changes(self, keep=100000):
+        """Drop all but the newest `keep` changes; lagging replicas then reload"""
+        with closing(self._connect()) as conn, conn:
+            latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            cutoff = latest - keep
+            if cutoff <= self._pruned_through(conn):
+                return
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (cutoff,))
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('pruned_through', ?)",
+                (cutoff,)
+            )
+
+    def insert_attendance(self, record):
+        """Insert one attendance record; False if already marked that day"""
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT INTO attendance VALUES (?, ?, ?, ?, ?, ?)",
+                    tuple(record[col] for col in ATTENDANCE_COLUMNS)
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def delete_attendance_on(self, day):
+        """Delete every record for one date and return how many were deleted"""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM attendance WHERE Date = ?", (day,)).rowcount
+
+    def clear_attendance(self):
+        """Delete every attendance record"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM attendance")
+
+    def get_students(self, student_ids):
+        """Get registry entries for several students; missing IDs are left out"""
+        student_ids = list(student_ids)
+        students = {}
+        with closing(self._connect()) as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(student_ids), 500):
+                chunk = student_ids[i:i + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                for sid, name, department, added_date in conn.execute(
+                    "SELECT student_id, name, department, added_date FROM students "
+                    f"WHERE student_id IN ({placeholders})",
+                    chunk
+                ):
+                    students[sid] = {'name': name, 'department': department, 'added_date': added_date}
+        return students
+
+    def upsert_student(self, student_id, info):
+        """Add or replace a student's registry entry"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO students VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (student_id) DO UPDATE SET "
+                "name = excluded.name, department = excluded.department, "
+                "added_date = excluded.added_date",
+                (student_id, info.get('name'), info.get('department'), info.get('added_date'))
+            )
+
+    def delete_student(self, student_id):
+        """Delete a student's registry entry"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+
+    def clear_students(self):
+        """Delete every student registry entry"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM students")
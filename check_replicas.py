@@ -0,0 +1,82 @@
+"""Check the shared SQLite store with several local replica processes.
+
+Run with ``python check_replicas.py``. Each worker process marks the same
+student IDs against one database; the store must keep exactly one record
+per (StudentID, Date), and an app instance must pick every mark up through
+the change feed. Everything runs in a temporary directory.
+"""
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+from datetime import date
+
+from attendance_store import SQLiteAttendanceStore
+
+REPLICAS = 4
+STUDENTS = 50
+
+def mark_all(db_file, replica, results):
+    """Mark every student as one replica would"""
+    store = SQLiteAttendanceStore(db_file)
+    marked = 0
+    for i in range(STUDENTS):
+        marked += store.insert_attendance({
+            'StudentID': str(5000 + i),
+            'Name': f"Student {i}",
+            'Date': str(date.today()),
+            'Time': "09:00:00",
+            'Method': f"Replica {replica}",
+            'Status': 'Present'
+        })
+    store.upsert_student(f"r{replica}", {'name': f"Replica {replica}"})
+    results.put(marked)
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp())
+    # Local files that the first start imports into the empty database
+    with open("attendance_data.csv", "w") as f:
+        f.write("StudentID,Name,Date,Time,Method,Status\n"
+                "1001,Old Record,2024-01-15,09:05:23,Manual,Present\n")
+    with open("students_data.json", "w") as f:
+        f.write('{"1001": {"name": "Old Record"}}')
+    db_file = os.path.abspath("attendance.db")
+    os.environ["ATTENDANCE_DB"] = db_file
+    logging.disable(logging.WARNING)
+    import streamlit_app
+
+    app = streamlit_app.AttendanceSystem()
+    assert app.count_records() == 1 and "1001" in app.students_data
+
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=mark_all, args=(db_file, replica, results))
+        for replica in range(REPLICAS)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    marked = [results.get() for _ in workers]
+    assert sum(marked) == STUDENTS, f"expected {STUDENTS} marks in total, got {marked}"
+
+    # The existing instance sees the other replicas' writes via the change feed
+    app.sync()
+    assert len(app.get_today_attendance()) == STUDENTS
+    assert all(f"r{replica}" in app.students_data for replica in range(REPLICAS))
+    success, _ = app.mark_attendance("5000", "Student 0")
+    assert not success, "duplicate mark was accepted"
+
+    # Clears must not be undone by a re-import on the next start
+    app.clear_all_attendance()
+    app.clear_all_students()
+    assert app.count_records() == 0 and not app.students_data
+    fresh = streamlit_app.AttendanceSystem()
+    assert fresh.count_records() == 0 and not fresh.students_data
+
+    print(f"OK: {REPLICAS} replicas, {STUDENTS} unique marks {marked}")
+
+if __name__ == "__main__":
+    main()
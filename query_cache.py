@@ -0,0 +1,69 @@
+"""LRU cache for read query results, bounded by a memory budget"""
+import functools
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+def estimate_size(value):
+    """Approximate memory used by a cached query result, in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    return sys.getsizeof(value)
+
+class QueryCache:
+    """Least-recently-used cache that evicts once max_bytes is exceeded"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (True, value) on a hit and (False, None) on a miss"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to stay in budget"""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def clear(self):
+        """Drop every cached result"""
+        self.entries.clear()
+        self.total_bytes = 0
+
+def cached_query(method):
+    """Memoize a read method on its arguments and the owner's data version.
+
+    The owner must provide ``query_cache`` and ``query_version()``; results
+    are reused until the version changes.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), self.query_version())
+        hit, value = self.query_cache.get(key)
+        if hit:
+            return value
+        value = method(self, *args, **kwargs)
+        self.query_cache.put(key, value)
+        return value
+    return wrapper
@@ -0,0 +1,207 @@
+"""Background report and export jobs run on a process pool"""
+import multiprocessing
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from attendance_history import AttendanceHistory, ATTENDANCE_COLUMNS
+from query_cache import estimate_size
+
+# Histories mapped inside each worker process, keyed by directory
+_worker_histories = {}
+
+def _open_history(history_dir, generation):
+    """Map the job's history snapshot inside a worker process"""
+    history = _worker_histories.get(history_dir)
+    if history is None:
+        history = _worker_histories[history_dir] = AttendanceHistory(history_dir)
+    # Every partition of a job must read the snapshot the job was planned on
+    if history.generation != generation and not history.map_snapshot(generation):
+        raise RuntimeError(f"Attendance history snapshot {generation} is no longer available")
+    return history
+
+def run_partition(history_dir, generation, kind, start, stop, include_header):
+    """Materialize one row slice of the history (runs in a worker process)"""
+    data = _open_history(history_dir, generation).take_rows(start, stop)
+    if kind == "export":
+        return data.to_csv(index=False, header=include_header)
+    return data
+
+def partition_by_month(dates):
+    """Split sorted date strings into (first, last) ranges, one per month"""
+    partitions = []
+    for day in dates:
+        if partitions and partitions[-1][0][:7] == day[:7]:
+            partitions[-1][1] = day
+        else:
+            partitions.append([day, day])
+    return [tuple(partition) for partition in partitions]
+
+class ReportJob:
+    """A report or export split into date partitions"""
+
+    def __init__(self, job_id, key, kind, start_date, end_date, futures):
+        self.job_id = job_id
+        self.key = key
+        self.kind = kind
+        self.start_date = start_date
+        self.end_date = end_date
+        self.futures = futures
+        self.status = "running"
+        self.result = None
+        self.size = 0
+        self.error = None
+
+    @property
+    def total(self):
+        return len(self.futures)
+
+    @property
+    def completed(self):
+        return sum(future.done() for future in self.futures)
+
+    @property
+    def progress(self):
+        return self.completed / self.total if self.futures else 1.0
+
+    def _merge(self):
+        """Merge the partition results once every partition has finished"""
+        try:
+            parts = [future.result() for future in self.futures]
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            return
+
+        if self.kind == "export":
+            if parts:
+                self.result = "".join(parts)
+            else:
+                self.result = pd.DataFrame(columns=ATTENDANCE_COLUMNS).to_csv(index=False)
+        elif parts:
+            self.result = pd.concat(parts, ignore_index=True)
+        else:
+            self.result = pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+        self.status = "done"
+
+class ReportJobManager:
+    """Runs report jobs on a process pool and caches finished results.
+
+    Results are cached by (kind, date range, data version), where the data
+    version is the generation of the history snapshot the job was run on.
+    Finished results are bounded by count (cache_size) and by their total
+    estimated size (max_bytes). A result larger than max_bytes is never
+    cached, and it is dropped once a later job finishes.
+    """
+
+    def __init__(self, history_dir, max_workers=None, cache_size=16, max_jobs=64,
+                 max_bytes=256 * 1024 * 1024):
+        self.history_dir = history_dir
+        # Spawn rather than fork: the Streamlit server process is multi-threaded
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.jobs = OrderedDict()
+        self.results = OrderedDict()
+        # Estimated size of every finished result still held in jobs
+        self.result_bytes = 0
+        self.lock = threading.Lock()
+
+    def submit(self, history, kind, start_date=None, end_date=None):
+        """Start a job over the mapped history and return its ID"""
+        start_date = str(start_date) if start_date else None
+        end_date = str(end_date) if end_date else None
+        key = (kind, start_date, end_date, history.generation)
+
+        with self.lock:
+            # Reuse a finished result or an identical job that is still running
+            job_id = self.results.get(key)
+            if job_id in self.jobs:
+                self.results.move_to_end(key)
+                return job_id
+            for job in self.jobs.values():
+                if job.status == "running" and job.key == key:
+                    return job.job_id
+
+            # Each month is a contiguous row slice of the date-sorted snapshot
+            partitions = [
+                history.row_range(first, last)
+                for first, last in partition_by_month(history.dates(start_date, end_date))
+            ]
+            futures = [
+                self.executor.submit(run_partition, self.history_dir, history.generation,
+                                     kind, start, stop, index == 0)
+                for index, (start, stop) in enumerate(partitions)
+            ]
+            job = ReportJob(uuid.uuid4().hex[:8], key, kind, start_date, end_date, futures)
+            self.jobs[job.job_id] = job
+            self._poll(job)
+            self._prune()
+            return job.job_id
+
+    def get(self, job_id):
+        """Get a job, merging its partitions if they have all finished"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                self._poll(job)
+            return job
+
+    def cancel(self, job_id):
+        """Cancel a running job; partitions already running are discarded"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != "running":
+                return False
+            for future in job.futures:
+                future.cancel()
+            job.status = "cancelled"
+            return True
+
+    def _poll(self, job):
+        if job.status == "running" and job.completed == job.total:
+            job._merge()
+            if job.status == "done":
+                job.size = estimate_size(job.result)
+                self.result_bytes += job.size
+                if job.size <= self.max_bytes:
+                    self.results[job.key] = job.job_id
+                self._evict(job)
+
+    def _evict(self, keep):
+        """Forget finished jobs until the count and byte budgets are met, except keep"""
+        # Results that can no longer be reused go first
+        cached = set(self.results.values())
+        for job in [job for job in self.jobs.values() if job.job_id not in cached]:
+            if self.result_bytes <= self.max_bytes:
+                break
+            if job is not keep and job.status == "done":
+                self._forget(job)
+        # Then the least recently used cached results
+        for job_id in list(self.results.values()):
+            if len(self.results) <= self.cache_size and self.result_bytes <= self.max_bytes:
+                break
+            if job_id != keep.job_id:
+                self._forget(self.jobs[job_id])
+
+    def _forget(self, job):
+        del self.jobs[job.job_id]
+        if self.results.get(job.key) == job.job_id:
+            del self.results[job.key]
+        self.result_bytes -= job.size
+
+    def _prune(self):
+        """Forget the oldest finished jobs that are no longer cached"""
+        cached = set(self.results.values())
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            job = self.jobs[job_id]
+            if job.status != "running" and job_id not in cached:
+                self._forget(job)
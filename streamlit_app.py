@@ -3,7 +3,19 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, date, timedelta
 import os
+import csv
+import io
 import json
+import time
+from itertools import chain, groupby
+
+from attendance_history import AttendanceHistory, ATTENDANCE_COLUMNS, fingerprint
+from attendance_store import SQLiteAttendanceStore
+from query_cache import QueryCache, cached_query
+from report_jobs import ReportJobManager
+
+# Rows per slice when writing the mapped history back out as CSV
+CSV_CHUNK_ROWS = 100000
 
 # Page configuration
 st.set_page_config(
@@ -16,77 +28,285 @@ class AttendanceSystem:
     def __init__(self):
         self.attendance_file = "attendance_data.csv"
         self.students_file = "students_data.json"
+        # Set ATTENDANCE_DB to share one SQLite database between app replicas
+        db_file = os.environ.get("ATTENDANCE_DB")
+        self.store = SQLiteAttendanceStore(db_file) if db_file else None
+        self.change_seq = 0
+        # Sealed history is served from the memory-mapped snapshot; attendance_df
+        # only holds it when the snapshot is unavailable
+        self.history = AttendanceHistory("attendance_history")
+        self.history_loaded = False
+        self.attendance_df = None
+        # Read results are memoized until the next mutation bumps data_version
+        self.query_cache = QueryCache()
+        self.data_version = 0
         self.load_data()
     
+    def query_version(self):
+        """Version of the data that cached query results depend on"""
+        # Other sessions' and replicas' writes are picked up by sync(), once
+        # per script run, and bump one of these
+        return self.data_version, self.history.generation
+    
+    def history_mapped(self):
+        """Whether history reads can be served from the mapped snapshot"""
+        # False after a failed load, when the snapshot no longer matches the
+        # data in memory
+        return self.history_loaded
+    
+    def bump_data_version(self):
+        """Invalidate cached query results after a mutation"""
+        self.data_version += 1
+        self.query_cache.clear()
+    
+    def _load_files(self):
+        """Read attendance and students from the CSV/JSON files"""
+        # Load attendance data
+        if os.path.exists(self.attendance_file):
+            attendance_df = pd.read_csv(self.attendance_file)
+            # Ensure all required columns exist
+            required_columns = ['StudentID', 'Name', 'Date', 'Time', 'Method', 'Status']
+            for col in required_columns:
+                if col not in attendance_df.columns:
+                    attendance_df[col] = ""
+        else:
+            attendance_df = pd.DataFrame(columns=[
+                'StudentID', 'Name', 'Date', 'Time', 'Method', 'Status'
+            ])
+        
+        # Load students data
+        if os.path.exists(self.students_file):
+            with open(self.students_file, 'r') as f:
+                students_data = json.load(f)
+        else:
+            students_data = {}
+        return attendance_df, students_data
+    
     def load_data(self):
-        """Load data from files"""
+        """Load data from files or the shared store"""
         try:
-            # Load attendance data
-            if os.path.exists(self.attendance_file):
-                self.attendance_df = pd.read_csv(self.attendance_file)
-                # Ensure all required columns exist
-                required_columns = ['StudentID', 'Name', 'Date', 'Time', 'Method', 'Status']
-                for col in required_columns:
-                    if col not in self.attendance_df.columns:
-                        self.attendance_df[col] = ""
+            if self.store is not None:
+                if not self.store.is_imported():
+                    # First start against a new database: import the local files once
+                    self.store.import_data(*self._load_files())
+                self.change_seq, attendance_df, self.students_data = self.store.load()
             else:
-                self.attendance_df = pd.DataFrame(columns=[
-                    'StudentID', 'Name', 'Date', 'Time', 'Method', 'Status'
-                ])
+                attendance_df, self.students_data = self._load_files()
             
-            # Load students data
-            if os.path.exists(self.students_file):
-                with open(self.students_file, 'r') as f:
-                    self.students_data = json.load(f)
-            else:
-                self.students_data = {}
+            # Split today's records into the in-memory shard; the sealed
+            # history goes to the memory-mapped snapshot
+            self.today_date = str(date.today())
+            is_today = attendance_df['Date'].astype(str) == self.today_date
+            self.today_df = attendance_df[is_today].reset_index(drop=True)
+            sealed_df = attendance_df[~is_today].reset_index(drop=True)
+            self.today_ids = set(self.today_df['StudentID'].astype(str))
+            
+            # Rebuild the memory-mapped history only when the sealed rows' content
+            # no longer matches it; appends to today's shard leave it untouched
+            if (not self.history.refresh()
+                    or len(self.history) != len(sealed_df)
+                    or self.history.fingerprint != fingerprint(sealed_df)):
+                self.history.write_snapshot(sealed_df)
+            self.history_loaded = self.history.refresh()
+            # Keep the sealed rows in memory only if the snapshot cannot be mapped
+            self.attendance_df = None if self.history_loaded else sealed_df
                 
         except Exception as e:
             st.error(f"Error loading data: {e}")
+            self.history_loaded = False
             self.attendance_df = pd.DataFrame(columns=[
                 'StudentID', 'Name', 'Date', 'Time', 'Method', 'Status'
             ])
+            self.today_date = str(date.today())
+            self.today_df = self.attendance_df.copy()
+            self.today_ids = set()
             self.students_data = {}
+        self.bump_data_version()
     
-    def save_data(self):
-        """Save data to files"""
+    def save_data(self, sealed_df=None):
+        """Save data to files, replacing the sealed history if sealed_df is given"""
+        self.bump_data_version()
         try:
-            self.attendance_df.to_csv(self.attendance_file, index=False)
+            if sealed_df is not None:
+                self._replace_history(sealed_df)
+            with open(self.attendance_file, 'w', newline='') as f:
+                self._write_attendance_csv(f)
             with open(self.students_file, 'w') as f:
                 json.dump(self.students_data, f, indent=4)
         except Exception as e:
             st.error(f"Error saving data: {e}")
     
+    def save_students(self):
+        """Save only the student registry, leaving attendance files untouched"""
+        self.bump_data_version()
+        try:
+            with open(self.students_file, 'w') as f:
+                json.dump(self.students_data, f, indent=4)
+        except Exception as e:
+            st.error(f"Error saving data: {e}")
+    
+    def roll_over_today(self):
+        """Seal the today shard into history once the date has changed"""
+        if str(date.today()) == self.today_date:
+            return False
+        # Re-read the CSV so marks appended by other sessions are sealed too;
+        # this splits off the new day's shard and rebuilds the snapshot
+        if self.store is not None:
+            self.store.prune_changes()
+        self.load_data()
+        return True
+    
+    def sync(self):
+        """Roll over the today shard, map the newest snapshot and apply other replicas' writes"""
+        if self.roll_over_today():
+            return
+        if self.history_loaded:
+            # Snapshots published by other sessions since the last run
+            self.history.refresh()
+        if self.store is None:
+            return
+        changes = self.store.changes_since(self.change_seq)
+        if changes is None:
+            # Our position in the change feed was pruned; reload everything
+            self.load_data()
+            return
+        if changes.empty:
+            return
+        
+        # Materialized from the snapshot only if the feed touches sealed history
+        sealed_df = None
+        for op, run in groupby(changes.itertuples(index=False), key=lambda change: change.op):
+            run = list(run)
+            if op == 'insert':
+                sealed_df = self._apply_inserts(pd.DataFrame(
+                    [[getattr(change, col) for col in ATTENDANCE_COLUMNS] for change in run],
+                    columns=ATTENDANCE_COLUMNS
+                ), sealed_df)
+            elif op == 'delete':
+                sealed_df = self._apply_deletes(
+                    {(change.StudentID, change.Date) for change in run}, sealed_df
+                )
+            elif op == 'student':
+                student_ids = {change.StudentID for change in run}
+                students = self.store.get_students(student_ids)
+                for student_id in student_ids:
+                    if student_id in students:
+                        self.students_data[student_id] = students[student_id]
+                    else:
+                        self.students_data.pop(student_id, None)
+        
+        self.change_seq = int(changes['seq'].iloc[-1])
+        if sealed_df is not None:
+            self._replace_history(sealed_df)
+        self.bump_data_version()
+    
+    @staticmethod
+    def _key_matches(df, keys):
+        """Rows of df whose (StudentID, Date) is in keys"""
+        return pd.MultiIndex.from_arrays(
+            [df['StudentID'].astype(str), df['Date'].astype(str)]
+        ).isin(keys)
+    
+    def _apply_inserts(self, records_df, sealed_df):
+        """Add records from the change feed; returns the sealed history, updated if touched"""
+        is_today = records_df['Date'] == self.today_date
+        if is_today.any():
+            self.today_df = pd.concat([self.today_df, records_df[is_today]], ignore_index=True)
+            self.today_ids.update(records_df.loc[is_today, 'StudentID'])
+        if is_today.all():
+            return sealed_df
+        records_df = records_df[~is_today]
+        if sealed_df is None:
+            sealed_df = self.get_sealed_attendance()
+        # Another session sharing the snapshot may have applied these already;
+        # the store keeps one record per (StudentID, Date), so replace by key
+        keys = set(zip(records_df['StudentID'], records_df['Date']))
+        sealed_df = sealed_df[~self._key_matches(sealed_df, keys)]
+        return pd.concat([sealed_df, records_df], ignore_index=True)
+    
+    def _apply_deletes(self, keys, sealed_df):
+        """Remove (StudentID, Date) records from the change feed; returns the sealed history"""
+        if any(day == self.today_date for _, day in keys):
+            self.today_df = self.today_df[~self._key_matches(self.today_df, keys)].reset_index(drop=True)
+            self.today_ids = set(self.today_df['StudentID'].astype(str))
+        if all(day == self.today_date for _, day in keys):
+            return sealed_df
+        if sealed_df is None:
+            sealed_df = self.get_sealed_attendance()
+        return sealed_df[~self._key_matches(sealed_df, keys)].reset_index(drop=True)
+    
+    def _replace_history(self, sealed_df):
+        """Publish new sealed history as the mapped snapshot"""
+        # Another session sharing the snapshot may already have published it
+        if not (self.history_mapped() and self.history.fingerprint == fingerprint(sealed_df)):
+            self.history.write_snapshot(sealed_df)
+        self.history_loaded = self.history.refresh()
+        self.attendance_df = None if self.history_loaded else sealed_df
+    
+    def _csv_header(self):
+        """Columns in the attendance CSV's header, or None if it has none"""
+        if not os.path.exists(self.attendance_file):
+            return None
+        with open(self.attendance_file, 'r', newline='') as f:
+            return next(csv.reader(f), None)
+    
+    def _append_records(self, records_df):
+        """Append records to the attendance CSV without rewriting history"""
+        header = self._csv_header()
+        if header is not None and any(col not in header for col in ATTENDANCE_COLUMNS):
+            # The file is missing a column; rewrite it once with the full
+            # header so appended rows line up with it
+            existing = pd.read_csv(self.attendance_file)
+            for col in ATTENDANCE_COLUMNS:
+                if col not in existing.columns:
+                    existing[col] = ""
+            existing.to_csv(self.attendance_file, index=False)
+            header = list(existing.columns)
+        elif header is not None:
+            with open(self.attendance_file, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    with open(self.attendance_file, 'a') as out:
+                        out.write('\n')
+        records_df.reindex(columns=header or ATTENDANCE_COLUMNS).to_csv(
+            self.attendance_file, mode='a', header=header is None, index=False
+        )
+    
     def mark_attendance(self, student_id, name, method="Manual"):
         """Mark attendance for a student"""
         try:
+            self.sync()
             current_time = datetime.now()
-            today_date = current_time.date()
             current_time_str = current_time.strftime("%H:%M:%S")
             
-            # Check if already marked today
-            if not self.attendance_df.empty and 'Date' in self.attendance_df.columns:
-                existing_record = self.attendance_df[
-                    (self.attendance_df['StudentID'].astype(str) == str(student_id)) & 
-                    (self.attendance_df['Date'] == str(today_date))
-                ]
-                
-                if not existing_record.empty:
-                    return False, "⚠️ Attendance already marked today"
+            # Check if already marked today; only the today shard is consulted
+            if str(student_id) in self.today_ids:
+                return False, "⚠️ Attendance already marked today"
             
             # Add new record
             new_record = {
                 'StudentID': str(student_id),
                 'Name': name,
-                'Date': str(today_date),
+                'Date': self.today_date,
                 'Time': current_time_str,
                 'Method': method,
                 'Status': 'Present'
             }
             
+            if self.store is not None:
+                # The store enforces (StudentID, Date) uniqueness across replicas;
+                # our own insert comes back through the change feed
+                inserted = self.store.insert_attendance(new_record)
+                self.sync()
+                if not inserted:
+                    return False, "⚠️ Attendance already marked today"
+                return True, "✅ Attendance marked successfully!"
+            
             new_df = pd.DataFrame([new_record])
-            self.attendance_df = pd.concat([self.attendance_df, new_df], ignore_index=True)
-            self.save_data()
+            self._append_records(new_df)
+            self.today_df = pd.concat([self.today_df, new_df], ignore_index=True)
+            self.today_ids.add(str(student_id))
+            self.bump_data_version()
             return True, "✅ Attendance marked successfully!"
             
         except Exception as e:
@@ -95,39 +315,100 @@ class AttendanceSystem:
     def add_student(self, student_id, name, department="General"):
         """Add a new student"""
         try:
-            self.students_data[str(student_id)] = {
+            info = {
                 'name': name,
                 'department': department,
                 'added_date': str(date.today())
             }
-            self.save_data()
+            if self.store is not None:
+                self.store.upsert_student(str(student_id), info)
+                self.sync()
+            else:
+                self.students_data[str(student_id)] = info
+                self.save_students()
             return True, "✅ Student added successfully!"
         except Exception as e:
             return False, f"❌ Error: {str(e)}"
     
     def get_today_attendance(self):
         """Get today's attendance records"""
-        today = str(date.today())
-        if not self.attendance_df.empty and 'Date' in self.attendance_df.columns:
-            return self.attendance_df[self.attendance_df['Date'] == today]
+        return self.today_df
+    
+    def get_sealed_attendance(self):
+        """Get the sealed history as a DataFrame, materialized from the snapshot"""
+        if self.history_mapped():
+            return self.history.to_frame()
+        return self.attendance_df
+    
+    def get_all_attendance(self):
+        """Get sealed history and today's records as one DataFrame"""
+        if self.today_df.empty:
+            return self.get_sealed_attendance()
+        return pd.concat([self.get_sealed_attendance(), self.today_df], ignore_index=True)
+    
+    def _write_attendance_csv(self, f):
+        """Write sealed history and today's records as CSV, one slice at a time"""
+        if self.history_mapped():
+            # Only one slice of the mapped history is materialized at a time
+            parts = (
+                self.history.take_rows(start, start + CSV_CHUNK_ROWS)
+                for start in range(0, len(self.history), CSV_CHUNK_ROWS)
+            )
         else:
-            return pd.DataFrame()
+            parts = [self.attendance_df]
+        pd.DataFrame(columns=ATTENDANCE_COLUMNS).to_csv(f, index=False)
+        for part in chain(parts, [self.today_df]):
+            part.reindex(columns=ATTENDANCE_COLUMNS).to_csv(f, index=False, header=False)
+    
+    def get_attendance_csv(self):
+        """Get sealed history and today's records as CSV text"""
+        buffer = io.StringIO()
+        self._write_attendance_csv(buffer)
+        return buffer.getvalue()
+    
+    def get_recent_attendance(self, count=3):
+        """Get the most recently marked records"""
+        if len(self.today_df) >= count:
+            return self.today_df.tail(count)
+        if self.history_mapped():
+            # Rows are sorted by date, so the latest ones are at the end
+            rows = len(self.history)
+            sealed = self.history.take_rows(max(rows - count, 0), rows)
+        else:
+            sealed = self.attendance_df.tail(count)
+        return pd.concat([sealed, self.today_df]).tail(count)
+    
+    def _with_today(self, history_data, today_data):
+        """Append today's matching records to a history query result"""
+        if today_data.empty:
+            return history_data
+        return pd.concat([history_data, today_data], ignore_index=True)
     
+    @cached_query
     def get_student_attendance(self, student_id):
         """Get attendance records for specific student"""
+        today_data = self.today_df[self.today_df['StudentID'].astype(str) == str(student_id)]
+        if self.history_mapped():
+            return self._with_today(self.history.filter_student(student_id), today_data)
         if not self.attendance_df.empty:
-            return self.attendance_df[
+            return self._with_today(self.attendance_df[
                 self.attendance_df['StudentID'].astype(str) == str(student_id)
-            ]
+            ], today_data)
         else:
-            return pd.DataFrame()
+            return today_data
     
     def delete_student(self, student_id):
         """Delete a student"""
         try:
+            # Pick up students added by other replicas before checking
+            self.sync()
             if student_id in self.students_data:
-                del self.students_data[student_id]
-                self.save_data()
+                if self.store is not None:
+                    self.store.delete_student(student_id)
+                    self.sync()
+                else:
+                    del self.students_data[student_id]
+                    self.save_students()
                 return True, "✅ Student deleted successfully!"
             else:
                 return False, "❌ Student not found!"
@@ -137,33 +418,111 @@ class AttendanceSystem:
     def clear_today_attendance(self):
         """Clear today's attendance records"""
         try:
-            today = str(date.today())
-            if not self.attendance_df.empty:
-                initial_count = len(self.attendance_df)
-                self.attendance_df = self.attendance_df[self.attendance_df['Date'] != today]
-                final_count = len(self.attendance_df)
-                deleted_count = initial_count - final_count
-                self.save_data()
+            self.sync()
+            if not self.today_df.empty:
+                if self.store is not None:
+                    deleted_count = self.store.delete_attendance_on(self.today_date)
+                    self.sync()
+                else:
+                    deleted_count = len(self.today_df)
+                    self.today_df = self.today_df.iloc[0:0]
+                    self.today_ids = set()
+                    self.save_data()
                 return True, f"✅ Deleted {deleted_count} attendance records for today!"
             else:
                 return False, "❌ No attendance records found!"
         except Exception as e:
             return False, f"❌ Error: {str(e)}"
     
+    def clear_all_attendance(self):
+        """Clear the attendance history and today's records"""
+        if self.store is not None:
+            self.store.clear_attendance()
+            self.sync()
+            return
+        self.today_df = self.today_df.iloc[0:0]
+        self.today_ids = set()
+        self.save_data(sealed_df=pd.DataFrame(columns=ATTENDANCE_COLUMNS))
+    
+    def clear_all_students(self):
+        """Clear the student registry"""
+        if self.store is not None:
+            self.store.clear_students()
+            self.sync()
+            return
+        self.students_data = {}
+        self.save_students()
+    
+    def get_today_in_range(self, start_date, end_date):
+        """Get today's records if today falls inside the date range"""
+        if str(start_date) <= self.today_date <= str(end_date):
+            return self.today_df
+        return self.today_df.iloc[0:0]
+    
+    @cached_query
     def export_attendance_report(self, start_date=None, end_date=None):
         """Export attendance report for date range"""
         try:
             if start_date and end_date:
+                today_data = self.get_today_in_range(start_date, end_date)
+                if self.history_mapped():
+                    return self._with_today(
+                        self.history.filter_date_range(start_date, end_date), today_data
+                    )
                 filtered_data = self.attendance_df[
                     (self.attendance_df['Date'] >= str(start_date)) & 
                     (self.attendance_df['Date'] <= str(end_date))
                 ]
-                return filtered_data
+                return self._with_today(filtered_data, today_data)
             else:
-                return self.attendance_df
+                return self.get_all_attendance()
         except Exception as e:
             st.error(f"Error generating report: {e}")
             return pd.DataFrame()
+    
+    @cached_query
+    def count_records(self):
+        """Get the total number of attendance records"""
+        if self.history_mapped():
+            return len(self.history) + len(self.today_df)
+        return len(self.attendance_df) + len(self.today_df)
+    
+    @cached_query
+    def count_unique(self, column):
+        """Get the number of distinct values in an attendance column"""
+        if self.history_mapped():
+            values = set(self.history.distinct(column))
+        else:
+            values = set(self.attendance_df[column].dropna().astype(str))
+        return len(values | set(self.today_df[column].dropna().astype(str)))
+    
+    @cached_query
+    def get_method_counts(self):
+        """Get the number of records per marking method"""
+        if self.history_mapped():
+            counts = self.history.value_counts('Method')
+        else:
+            counts = self.attendance_df['Method'].value_counts()
+        if self.today_df.empty:
+            return counts
+        counts = counts.add(self.today_df['Method'].value_counts(), fill_value=0)
+        return counts.astype(int).sort_values(ascending=False)
+    
+    @cached_query
+    def get_daily_counts(self):
+        """Get the number of records per day"""
+        if self.history_mapped():
+            counts = self.history.daily_counts()
+        else:
+            counts = self.attendance_df.groupby('Date').size()
+        if self.today_df.empty:
+            return counts
+        return counts.add(pd.Series({self.today_date: len(self.today_df)}), fill_value=0).astype(int)
+
+@st.cache_resource
+def get_report_jobs(history_dir):
+    """Process pool for report jobs, shared by every session on this server"""
+    return ReportJobManager(history_dir)
 
 def main():
     st.title("📋 Even Check Attendance System")
@@ -174,6 +533,8 @@ def main():
         st.session_state.attendance_system = AttendanceSystem()
     
     system = st.session_state.attendance_system
+    # Pick up midnight rollover and other sessions' writes once per run
+    system.sync()
     
     # Sidebar navigation
     st.sidebar.title("Navigation")
@@ -203,15 +564,15 @@ def show_dashboard(system):
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_records = len(system.attendance_df)
+        total_records = system.count_records()
         st.metric("Total Records", total_records)
     
     with col2:
-        unique_students = system.attendance_df['StudentID'].nunique() if not system.attendance_df.empty else 0
+        unique_students = system.count_unique('StudentID')
         st.metric("Unique Students", unique_students)
     
     with col3:
-        total_days = system.attendance_df['Date'].nunique() if not system.attendance_df.empty else 0
+        total_days = system.count_unique('Date')
         st.metric("Total Days", total_days)
     
     with col4:
@@ -271,8 +632,8 @@ def show_dashboard(system):
         
         # Recent activity
         st.subheader("📈 Recent Activity")
-        if not system.attendance_df.empty:
-            recent = system.attendance_df.tail(3)
+        recent = system.get_recent_attendance(3)
+        if not recent.empty:
             for _, row in recent.iterrows():
                 st.write(f"**{row['Name']}** - {row['Time']}")
         else:
@@ -538,7 +899,7 @@ def show_manage_students(system):
 def show_reports(system):
     st.header("📊 Reports & Analytics")
     
-    if system.attendance_df.empty:
+    if system.count_records() == 0:
         st.info("No data available for reports. Mark some attendance first!")
         return
     
@@ -548,15 +909,15 @@ def show_reports(system):
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_records = len(system.attendance_df)
+        total_records = system.count_records()
         st.metric("Total Records", total_records)
     
     with col2:
-        unique_students = system.attendance_df['StudentID'].nunique()
+        unique_students = system.count_unique('StudentID')
         st.metric("Unique Students", unique_students)
     
     with col3:
-        total_days = system.attendance_df['Date'].nunique()
+        total_days = system.count_unique('Date')
         st.metric("Total Days", total_days)
     
     with col4:
@@ -572,7 +933,7 @@ def show_reports(system):
     
     with col1:
         st.write("**Method Distribution**")
-        method_counts = system.attendance_df['Method'].value_counts()
+        method_counts = system.get_method_counts()
         if not method_counts.empty:
             st.bar_chart(method_counts)
         else:
@@ -580,7 +941,7 @@ def show_reports(system):
     
     with col2:
         st.write("**Daily Attendance Trend**")
-        daily_counts = system.attendance_df.groupby('Date').size()
+        daily_counts = system.get_daily_counts()
         if not daily_counts.empty:
             st.line_chart(daily_counts)
         else:
@@ -599,27 +960,25 @@ def show_reports(system):
     with col2:
         end_date = st.date_input("End Date", value=date.today())
     
+    # Heavy reports run as background jobs over the mapped history
+    jobs = get_report_jobs(system.history.history_dir)
+    use_jobs = system.history_mapped()
+    
     if st.button("Generate Custom Report", use_container_width=True):
-        filtered_data = system.attendance_df[
-            (system.attendance_df['Date'] >= str(start_date)) & 
-            (system.attendance_df['Date'] <= str(end_date))
-        ]
-        
-        if not filtered_data.empty:
-            st.write(f"**Report for {start_date} to {end_date}:**")
-            st.dataframe(filtered_data, use_container_width=True)
-            
-            # Export custom report
-            csv_data = filtered_data.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Custom Report",
-                data=csv_data,
-                file_name=f"attendance_report_{start_date}_to_{end_date}.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+        if use_jobs:
+            st.session_state.report_job = jobs.submit(system.history, "report", start_date, end_date)
         else:
-            st.info("No records found for the selected date range")
+            show_custom_report(system.export_attendance_report(start_date, end_date),
+                               start_date, end_date)
+    
+    report_job = show_report_job(jobs, "report_job")
+    if report_job is not None and report_job.status == "done":
+        # Jobs only cover sealed history; today's shard is added on top
+        today_data = system.get_today_in_range(report_job.start_date, report_job.end_date)
+        report_data = report_job.result
+        if not today_data.empty:
+            report_data = pd.concat([report_data, today_data], ignore_index=True)
+        show_custom_report(report_data, report_job.start_date, report_job.end_date)
     
     # Quick exports
     st.markdown("---")
@@ -627,16 +986,31 @@ def show_reports(system):
     
     col1, col2 = st.columns(2)
     
+    export_job = None
     with col1:
         # Export full attendance data
-        full_csv = system.attendance_df.to_csv(index=False)
-        st.download_button(
-            label="📥 Download Full Attendance Data",
-            data=full_csv,
-            file_name="full_attendance_data.csv",
-            mime="text/csv",
-            use_container_width=True
-        )
+        if use_jobs:
+            if st.button("📦 Prepare Full Attendance Export", use_container_width=True):
+                st.session_state.export_job = jobs.submit(system.history, "export")
+            
+            export_job = show_report_job(jobs, "export_job")
+            if export_job is not None and export_job.status == "done":
+                st.download_button(
+                    label="📥 Download Full Attendance Data",
+                    data=export_job.result + system.get_today_attendance().to_csv(index=False, header=False),
+                    file_name="full_attendance_data.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+        else:
+            full_csv = system.get_attendance_csv()
+            st.download_button(
+                label="📥 Download Full Attendance Data",
+                data=full_csv,
+                file_name="full_attendance_data.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
     
     with col2:
         # Export today's data
@@ -650,6 +1024,51 @@ def show_reports(system):
                 mime="text/csv",
                 use_container_width=True
             )
+    
+    # Keep polling while a background job is still running
+    if any(job is not None and job.status == "running" for job in (report_job, export_job)):
+        time.sleep(0.5)
+        st.rerun()
+
+def show_report_job(jobs, session_key):
+    """Show the progress of the background job stored under session_key"""
+    job_id = st.session_state.get(session_key)
+    if job_id is None:
+        return None
+    
+    job = jobs.get(job_id)
+    if job is None:
+        st.session_state[session_key] = None
+        return None
+    
+    if job.status == "running":
+        st.progress(job.progress, text=f"Job {job.job_id}: {job.completed}/{job.total} partitions done")
+        if st.button("✖️ Cancel", key=f"cancel_{session_key}"):
+            jobs.cancel(job.job_id)
+            st.rerun()
+    elif job.status == "cancelled":
+        st.warning(f"Job {job.job_id} was cancelled")
+    elif job.status == "failed":
+        st.error(f"Job {job.job_id} failed: {job.error}")
+    return job
+
+def show_custom_report(filtered_data, start_date, end_date):
+    """Show a custom date range report with its download button"""
+    if not filtered_data.empty:
+        st.write(f"**Report for {start_date} to {end_date}:**")
+        st.dataframe(filtered_data, use_container_width=True)
+        
+        # Export custom report
+        csv_data = filtered_data.to_csv(index=False)
+        st.download_button(
+            label="📥 Download Custom Report",
+            data=csv_data,
+            file_name=f"attendance_report_{start_date}_to_{end_date}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+    else:
+        st.info("No records found for the selected date range")
 
 def show_system_tools(system):
     st.header("⚙️ System Tools")
@@ -663,12 +1082,11 @@ def show_system_tools(system):
         
         with col1:
             st.write("**Attendance Data**")
-            st.metric("Total Records", len(system.attendance_df))
+            st.metric("Total Records", system.count_records())
             
             if st.button("🗑️ Clear All Attendance", use_container_width=True, type="secondary"):
                 if st.checkbox("Confirm permanent deletion of ALL attendance records"):
-                    system.attendance_df = pd.DataFrame(columns=['StudentID', 'Name', 'Date', 'Time', 'Method', 'Status'])
-                    system.save_data()
+                    system.clear_all_attendance()
                     st.success("✅ All attendance records cleared!")
                     st.rerun()
             
@@ -682,8 +1100,7 @@ def show_system_tools(system):
             
             if st.button("🗑️ Clear All Students", use_container_width=True, type="secondary"):
                 if st.checkbox("Confirm permanent deletion of ALL student records"):
-                    system.students_data = {}
-                    system.save_data()
+                    system.clear_all_students()
                     st.success("✅ All student records cleared!")
                     st.rerun()
     
@@ -699,7 +1116,7 @@ def show_system_tools(system):
                 backup_time = datetime.now().strftime("%Y%m%d_%H%M%S")
                 
                 # Backup attendance
-                attendance_backup = system.attendance_df.to_csv(index=False)
+                attendance_backup = system.get_attendance_csv()
                 st.download_button(
                     label="📥 Download Attendance Backup",
                     data=attendance_backup,
@@ -721,7 +1138,7 @@ def show_system_tools(system):
         with col2:
             st.write("**System Information**")
             st.write(f"**Last Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            st.write(f"**Data Files:** {len(system.attendance_df)} records, {len(system.students_data)} students")
+            st.write(f"**Data Files:** {system.count_records()} records, {len(system.students_data)} students")
             
             if st.button("🔄 Refresh System", use_container_width=True):
                 system.load_data()
@@ -737,9 +1154,9 @@ def show_system_tools(system):
             if st.button("📊 Generate Summary", use_container_width=True):
                 st.info(f"""
                 **System Summary:**
-                - Total Attendance Records: {len(system.attendance_df)}
+                - Total Attendance Records: {system.count_records()}
                 - Registered Students: {len(system.students_data)}
-                - Unique Attendance Days: {system.attendance_df['Date'].nunique() if not system.attendance_df.empty else 0}
+                - Unique Attendance Days: {system.count_unique('Date')}
                 - Today's Records: {len(system.get_today_attendance())}
                 """)
         